@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 """
-STEP to STL Converter with admesh mesh repair
+STEP to STL Converter with mesh repair
 
 This script converts STEP files to STL format using:
 - OpenCASCADE (OCP) for STEP reading and initial meshing
-- admesh for repairing non-manifold meshes (command-line tool)
+- NumPy for in-process mesh repair (mesh_repair.py, Numba-accelerated if installed)
+- admesh for repairing non-manifold meshes (optional, --legacy-admesh)
+
+The in-process repair:
+- Merges vertices closer than the tolerance (like admesh -n)
+- Removes facets that became degenerate
+- Orients closed meshes outward (like admesh -d)
+- Does not fill holes or connect nearby facets (use --legacy-admesh)
+- Recomputes normal values (like admesh -v)
 
 admesh repairs meshes by:
 - Finding and connecting nearby facets (-n)
@@ -16,57 +24,253 @@ admesh repairs meshes by:
 Requirements:
 - Python 3.11+
 - OCP (OpenCASCADE Python bindings): conda install -c conda-forge cadquery
-- admesh: brew install admesh
+- NumPy: pip install numpy
+- Numba (optional, faster mesh repair): pip install numba
+- admesh (only for --legacy-admesh): brew install admesh
 
 Usage:
-    python convert_step_to_stl.py
+    python convert_step_to_stl.py [--quality {coarse,default,fine}] [--no-repair | --legacy-admesh]
+                                  [--parallel N] [--files STEP ...] [--force]
 
 Author: Generated with Claude Code
 """
+import argparse
+import json
+import logging
+import multiprocessing
 import os
 import subprocess
+import sys
 import tempfile
+from concurrent.futures import ProcessPoolExecutor, wait
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
-from OCP.STEPControl import STEPControl_Reader
+import numpy as np
+
+from OCP.STEPCAFControl import STEPCAFControl_Reader
+from OCP.TDocStd import TDocStd_Document
+from OCP.TCollection import TCollection_ExtendedString
+from OCP.TDF import TDF_LabelSequence
+from OCP.XCAFDoc import XCAFDoc_DocumentTool
 from OCP.BRepMesh import BRepMesh_IncrementalMesh
-from OCP.StlAPI import StlAPI_Writer
-from OCP.TopExp import TopExp_Explorer
-from OCP.TopAbs import TopAbs_SOLID
+from OCP.IMeshTools import IMeshTools_Parameters
+from OCP.OSD import OSD_Parallel, OSD_ThreadPool
+from OCP.TopExp import TopExp, TopExp_Explorer
+from OCP.TopTools import TopTools_IndexedMapOfShape
+from OCP.TopAbs import TopAbs_FACE, TopAbs_SOLID
+from OCP.TopLoc import TopLoc_Location
 from OCP.TopoDS import TopoDS
 from OCP.Bnd import Bnd_Box
 from OCP.BRepBndLib import BRepBndLib
-from OCP.BRep import BRep_Builder
+from OCP.BRep import BRep_Builder, BRep_Tool
 from OCP.TopoDS import TopoDS_Compound
+from OCP.StlAPI import StlAPI_Writer
+
+from mesh_repair import repair_triangles, unit_normals
+
+logger = logging.getLogger("step2stl")
+
+LOG_FORMAT = "[%(job)s] %(message)s"
+
+# Name of the conversion job running in this process, added to log records
+_current_job = 'main'
+
+# Runtime options, filled from the command line and copied into workers
+SETTINGS = {
+    'legacy_admesh': False,
+    'quality': 'default',
+    'reuse_reader': False,
+    'no_repair': False,
+}
+
+# Linear deflection relative to the largest solid's bbox diagonal; OCCT's
+# recommended default is 1e-3 x diagonal, scaled by the --quality factor
+RELATIVE_DEFLECTION = 1e-3
+QUALITY_FACTORS = {
+    'coarse': 5.0,
+    'default': 1.0,
+    'fine': 0.2,
+}
+MIN_LINEAR_DEFLECTION = 1e-4  # mm
+
+# Records the inputs and settings of the last successful conversion per job
+STAMP_FILE = ".convert_step_to_stl.json"
+
+# STL files are written with os.write in chunks of this size
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+# STEP reader shared by all reads of a process with --reuse-reader
+_shared_reader = None
+
+# Binary STL facet record: normal, three vertices, attribute byte count
+STL_DTYPE = np.dtype([
+    ('normals', '<f4', 3),
+    ('v0', '<f4', 3),
+    ('v1', '<f4', 3),
+    ('v2', '<f4', 3),
+    ('attr', '<u2'),
+])
+
+
+def prefetch_file(filepath: str):
+    """Ask the kernel to start reading a file into the page cache"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    fd = os.open(filepath, os.O_RDONLY)
+    try:
+        # OCCT opens the file itself, so a SEQUENTIAL hint on this fd would
+        # not reach its reads; WILLNEED starts readahead for any reader
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+
+
+def _new_step_reader():
+    """
+    XDE reader that only transfers shapes.
+
+    STL has no colors, names, layers or properties, so their passes over the
+    model are skipped; the shape tool still keeps assembly instancing.
+    """
+    reader = STEPCAFControl_Reader()
+    reader.SetColorMode(False)
+    reader.SetNameMode(False)
+    reader.SetLayerMode(False)
+    reader.SetPropsMode(False)
+    return reader
 
 
 def read_step(filepath: str):
-    """Read STEP file and return shape"""
-    print(f"Reading STEP file: {filepath}")
-    reader = STEPControl_Reader()
+    """
+    Read STEP file into an XDE document and return its shape.
+
+    Unlike STEPControl_Reader, the XDE transfer keeps assembly instancing:
+    repeated parts share one TShape and differ only by their location.
+    """
+    logger.info(f"Reading STEP file: {filepath}")
+    prefetch_file(filepath)
+    doc = TDocStd_Document(TCollection_ExtendedString("XmlOcaf"))
+    if SETTINGS['reuse_reader']:
+        _transfer_shared(filepath, doc)
+    else:
+        reader = _new_step_reader()
+        status = reader.ReadFile(filepath)
+        if status != 1:
+            raise Exception(f"Failed to read STEP file, status: {status}")
+        if not reader.Transfer(doc):
+            raise Exception(f"Failed to transfer STEP file: {filepath}")
+
+    shape_tool = XCAFDoc_DocumentTool.ShapeTool_s(doc.Main())
+    labels = TDF_LabelSequence()
+    shape_tool.GetFreeShapes(labels)
+    shapes = [shape_tool.GetShape_s(labels.Value(i)) for i in range(1, labels.Length() + 1)]
+    if len(shapes) == 1:
+        return shapes[0]
+    return make_compound(shapes)
+
+
+def _transfer_shared(filepath: str, doc):
+    """
+    Read a STEP file with the process-wide reader.
+
+    Reusing the reader amortizes its schema and static caches over several
+    files, at the cost of isolation: a failed parse can leave state behind.
+    """
+    global _shared_reader
+    if _shared_reader is None:
+        _shared_reader = _new_step_reader()
+    reader = _shared_reader
+    reader.Reader().ClearShapes()
     status = reader.ReadFile(filepath)
     if status != 1:
         raise Exception(f"Failed to read STEP file, status: {status}")
-    reader.TransferRoots()
-    return reader.OneShape()
+    # Transfer loops over the roots itself; TransferOneRoot per root would
+    # rerun the XDE attribute passes over the whole model for every root
+    if not reader.Transfer(doc):
+        raise Exception(f"Failed to transfer STEP file: {filepath}")
+
+
+def iter_subshapes(shape, shape_type):
+    """
+    Yield the distinct sub-shapes of a type, collected in one C++ call.
+
+    Saves the More/Current/Next round-trips of a TopExp_Explorer loop.
+    Shapes are deduplicated with IsSame, which ignores orientation, so use
+    it for solids only, not for faces that must be written per solid.
+    """
+    shape_map = TopTools_IndexedMapOfShape()
+    TopExp.MapShapes_s(shape, shape_type, shape_map)
+    for i in range(1, shape_map.Extent() + 1):
+        yield shape_map.FindKey(i)
 
 
 def get_solids(shape):
-    """Extract all solids from shape with bounding box info"""
-    explorer = TopExp_Explorer(shape, TopAbs_SOLID)
+    """
+    Extract all solids from shape with bounding box info.
+
+    Returns (solids, bboxes) where bboxes is an (n, 6) array of
+    (xmin, ymin, zmin, xmax, ymax, zmax) rows matching the solids list.
+    """
     solids = []
-    while explorer.More():
-        solid = TopoDS.Solid_s(explorer.Current())
+    bounds = []
+    # Bounding boxes of instance prototypes (solids without location),
+    # keyed by hash and checked with IsPartner for collisions
+    prototypes = {}
+    for subshape in iter_subshapes(shape, TopAbs_SOLID):
+        solid = TopoDS.Solid_s(subshape)
+        prototype = solid.Located(TopLoc_Location())
+        candidates = prototypes.setdefault(_shape_key(prototype), [])
+        for other, proto_bounds in candidates:
+            if other.IsPartner(prototype):
+                break
+        else:
+            bbox = Bnd_Box()
+            BRepBndLib.Add_s(prototype, bbox)
+            proto_bounds = np.array(bbox.Get())
+            candidates.append((prototype, proto_bounds))
+        solids.append(solid)
+        bounds.append(_transform_bounds(proto_bounds, solid.Location()))
+
+    bboxes = np.empty((len(solids), 6), dtype=np.float64)
+    if bounds:
+        bboxes[:] = bounds
+    return solids, bboxes
+
+
+def _shape_key(shape):
+    """Hash a shape by TShape and location (API differs between OCP releases)"""
+    if hasattr(shape, 'HashCode'):
+        return shape.HashCode(2 ** 31 - 1)
+    return hash(shape)
+
+
+def _location_affine(loc):
+    """Return a TopLoc_Location as a 3x4 affine [R | t]"""
+    trsf = loc.Transformation()
+    return np.array([[trsf.Value(r, c) for c in range(1, 5)] for r in range(1, 4)])
+
+
+def _transform_bounds(bounds, loc):
+    """Axis-aligned bounds of a (xmin, ymin, zmin, xmax, ymax, zmax) box moved by loc"""
+    if loc.IsIdentity():
+        return bounds
+    lo, hi = bounds[:3], bounds[3:]
+    corners = np.array([[x, y, z] for x in (lo[0], hi[0]) for y in (lo[1], hi[1]) for z in (lo[2], hi[2])])
+    affine = _location_affine(loc)
+    moved = np.einsum('ij,nj->ni', affine[:, :3], corners) + affine[:, 3]
+    return np.concatenate([moved.min(axis=0), moved.max(axis=0)])
+
+
+def linear_deflection(shape, bboxes):
+    """Pick the linear deflection (mm) from part size and the quality setting"""
+    if len(bboxes) == 0:
         bbox = Bnd_Box()
-        BRepBndLib.Add_s(solid, bbox)
-        xmin, ymin, zmin, xmax, ymax, zmax = bbox.Get()
-        solids.append({
-            'solid': solid,
-            'center_x': (xmin + xmax) / 2,
-            'bbox': (xmin, ymin, zmin, xmax, ymax, zmax)
-        })
-        explorer.Next()
-    return solids
+        BRepBndLib.Add_s(shape, bbox)
+        bboxes = np.array([bbox.Get()])
+    diag = np.sqrt(np.sum((bboxes[:, 3:] - bboxes[:, :3]) ** 2, axis=1)).max()
+    factor = QUALITY_FACTORS[SETTINGS['quality']]
+    return max(MIN_LINEAR_DEFLECTION, RELATIVE_DEFLECTION * factor * float(diag))
 
 
 def make_compound(solid_list):
@@ -75,10 +279,7 @@ def make_compound(solid_list):
     compound = TopoDS_Compound()
     builder.MakeCompound(compound)
     for s in solid_list:
-        if isinstance(s, dict):
-            builder.Add(compound, s['solid'])
-        else:
-            builder.Add(compound, s)
+        builder.Add(compound, s)
     return compound
 
 
@@ -86,7 +287,7 @@ def repair_stl_with_admesh(input_file: str, output_file: str):
     """
     Repair STL file using admesh to fix non-manifold edges and other issues.
     """
-    print(f"  Repairing mesh with admesh...")
+    logger.info("  Repairing mesh with admesh...")
 
     # Run admesh with all repair options
     cmd = [
@@ -105,137 +306,438 @@ def repair_stl_with_admesh(input_file: str, output_file: str):
     try:
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
         if result.returncode != 0:
-            print(f"    Warning: admesh returned {result.returncode}")
+            logger.warning(f"    admesh returned {result.returncode}")
             if result.stderr:
-                print(f"    stderr: {result.stderr[:200]}")
+                logger.warning(f"    stderr: {result.stderr[:200]}")
         else:
             # Parse admesh output for stats
-            for line in result.stdout.split('\n'):
-                if 'edges fixed' in line.lower() or 'facets' in line.lower() or 'normal' in line.lower():
-                    print(f"    {line.strip()}")
+            if logger.isEnabledFor(logging.DEBUG):
+                for line in result.stdout.split('\n'):
+                    if 'edges fixed' in line.lower() or 'facets' in line.lower() or 'normal' in line.lower():
+                        logger.debug(f"    {line.strip()}")
     except subprocess.TimeoutExpired:
-        print(f"    Warning: admesh timed out")
+        logger.warning("    admesh timed out")
     except Exception as e:
-        print(f"    Warning: admesh failed: {e}")
+        logger.warning(f"    admesh failed: {e}")
 
 
-def mesh_and_export(shape, filename: str, linear_defl: float = 0.001, angular_defl: float = 0.05):
-    """Mesh shape and export to STL with high precision, then repair with admesh"""
-    print(f"\nMeshing {filename}...")
-    print(f"  Linear deflection: {linear_defl} mm")
-    print(f"  Angular deflection: {angular_defl} rad (~{angular_defl * 180 / 3.14159:.1f} degrees)")
+def write_shape_stl(shape, filename: str):
+    """Write the triangulation of a meshed shape as binary STL with OCCT's writer"""
+    writer = StlAPI_Writer()
+    writer.ASCIIMode = False
+    if not writer.Write(shape, filename):
+        raise Exception(f"Failed to save STL: {filename}")
 
-    mesh = BRepMesh_IncrementalMesh(shape, linear_defl, False, angular_defl, True)
-    mesh.Perform()
 
-    if not mesh.IsDone():
-        raise Exception(f"Meshing failed for {filename}")
+def shape_triangles(shape):
+    """
+    Collect the triangulation of every face of a meshed shape as an (n, 3, 3) array.
 
-    # First export to a temp file
+    The faces are walked in C++ by StlAPI_Writer into a temp file, which is
+    loaded back with one np.fromfile. This costs an extra write and read of
+    the STL, but OCP has no bulk accessor for Poly_Triangulation, and a
+    Python face walk (several OCP calls per node and per triangle) has not
+    been shown to be faster. Coordinates are float32, as stored in binary STL.
+    """
     with tempfile.NamedTemporaryFile(suffix='.stl', delete=False) as tmp:
         temp_file = tmp.name
+    try:
+        write_shape_stl(shape, temp_file)
+        records = np.fromfile(temp_file, dtype=STL_DTYPE, offset=84)
+    finally:
+        os.unlink(temp_file)
+    return np.stack([records['v0'], records['v1'], records['v2']], axis=1)
 
-    writer = StlAPI_Writer()
-    writer.ASCIIMode = False
-    result = writer.Write(shape, temp_file)
 
-    if not result:
-        os.unlink(temp_file)
-        raise Exception(f"Failed to save temp STL")
+def write_binary_stl(filename: str, triangles):
+    """Write an (n, 3, 3) triangle array as binary STL"""
+    normals = unit_normals(triangles)
+
+    records = np.zeros(len(triangles), dtype=STL_DTYPE)
+    records['normals'] = normals
+    records['v0'] = triangles[:, 0]
+    records['v1'] = triangles[:, 1]
+    records['v2'] = triangles[:, 2]
+
+    header = b'Binary STL written by convert_step_to_stl'.ljust(80, b' ')
+    header += np.uint32(len(records)).tobytes()
+
+    # O_BINARY keeps Windows from translating newlines in the records
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0)
+    fd = os.open(filename, flags, 0o644)
+    try:
+        _write_all(fd, memoryview(header))
+        body = memoryview(records.view(np.uint8))
+        for start in range(0, len(body), WRITE_CHUNK_SIZE):
+            _write_all(fd, body[start:start + WRITE_CHUNK_SIZE])
+        _drop_page_cache(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_all(fd: int, data: memoryview):
+    """os.write until every byte of data is written"""
+    while data:
+        written = os.write(fd, data)
+        data = data[written:]
+
+
+def _drop_page_cache(fd: int):
+    """
+    Flush fd and tell the kernel its pages will not be read again.
+
+    The STL outputs are write-once; keeping them in the page cache only
+    evicts data that is still useful, like the next STEP file.
+    """
+    # Without fadvise (Windows, macOS) the fsync would be pure cost, and on
+    # Windows it fails on the read-only descriptors of drop_page_cache
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    os.fsync(fd)
+    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
 
-    # Repair with admesh
-    repair_stl_with_admesh(temp_file, filename)
 
-    # Clean up temp file
-    os.unlink(temp_file)
+def drop_page_cache(filename: str):
+    """Drop the cached pages of a file written by another tool (e.g. admesh)"""
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        _drop_page_cache(fd)
+    finally:
+        os.close(fd)
+
+
+def mesh_shape_once(shape, linear_defl: float = 0.001, angular_defl: float = 0.05):
+    """Mesh shape with high precision, attaching a triangulation to every face"""
+    logger.info("Meshing shape...")
+    logger.info(f"  Linear deflection: {linear_defl:.4g} mm")
+    logger.info(f"  Angular deflection: {angular_defl} rad (~{angular_defl * 180 / 3.14159:.1f} degrees)")
+
+    params = IMeshTools_Parameters()
+    params.Deflection = linear_defl
+    params.Angle = angular_defl
+    params.Relative = False
+    params.InParallel = True  # triangulate faces concurrently
+    params.MinSize = 1e-7
+    params.InternalVerticesMode = True
+    params.ControlSurfaceDeflection = True
+
+    mesh = BRepMesh_IncrementalMesh(shape, params)
+    mesh.Perform()
 
-    if os.path.exists(filename):
-        size = os.path.getsize(filename)
-        print(f"  Saved: {filename} ({size / 1024 / 1024:.2f} MB)")
+    if not mesh.IsDone():
+        raise Exception("Meshing failed")
+
+
+def _is_meshed(shape):
+    """Check whether the first face of shape already carries a triangulation"""
+    explorer = TopExp_Explorer(shape, TopAbs_FACE)
+    if not explorer.More():
+        return False
+    loc = TopLoc_Location()
+    return BRep_Tool.Triangulation_s(TopoDS.Face_s(explorer.Current()), loc) is not None
+
+
+def _ensure_meshed(shape, linear_defl: float = 0.001, angular_defl: float = 0.05):
+    """Mesh shape unless its faces were already triangulated (e.g. via the parent shape)"""
+    if not _is_meshed(shape):
+        mesh_shape_once(shape, linear_defl, angular_defl)
+
+
+def _write_stl(shape, filename: str):
+    """Export the triangulation of a meshed shape to STL, then repair it"""
+    logger.info(f"Exporting {filename}...")
+
+    if SETTINGS['no_repair']:
+        # Fast path: the raw OCCT triangulation, non-manifold edges included
+        write_shape_stl(shape, filename)
+        drop_page_cache(filename)
+    elif SETTINGS['legacy_admesh']:
+        # admesh works on files: export to a temp file first. It only logs
+        # its failures, so remove the old output to be able to tell whether
+        # this run actually produced a new one.
+        if os.path.exists(filename):
+            os.unlink(filename)
+        with tempfile.NamedTemporaryFile(suffix='.stl', delete=False) as tmp:
+            temp_file = tmp.name
+        try:
+            write_shape_stl(shape, temp_file)
+            repair_stl_with_admesh(temp_file, filename)
+        finally:
+            os.unlink(temp_file)
+        if not os.path.exists(filename):
+            raise Exception(f"admesh did not create {filename}")
+        drop_page_cache(filename)
     else:
-        print(f"  Warning: Output file not created")
+        triangles = shape_triangles(shape)
+        if len(triangles) == 0:
+            raise Exception(f"No triangulation to save for {filename}")
+        write_binary_stl(filename, repair_triangles(triangles))
+
+    size = os.path.getsize(filename)
+    logger.info(f"  Saved: {filename} ({size / 1024 / 1024:.2f} MB)")
+
 
+def mesh_and_export(shape, filename: str, linear_defl: float = 0.001, angular_defl: float = 0.05):
+    """Mesh shape (if needed) and export to STL, then repair it"""
+    _ensure_meshed(shape, linear_defl, angular_defl)
+    _write_stl(shape, filename)
+
+
+def export_groups(groups, linear_defl: float = 0.001, angular_defl: float = 0.05):
+    """
+    Mesh several groups of solids in a single pass and write one STL per group.
+
+    groups is a list of (solids, filename). The groups share no faces, so
+    meshing their union once triangulates every face exactly once; each STL
+    is then written from the faces of its own solids only.
+    """
+    groups = [(solids, filename) for solids, filename in groups if solids]
+    if not groups:
+        return
+    combined = make_compound([s for solids, _ in groups for s in solids])
+    _ensure_meshed(combined, linear_defl, angular_defl)
+    for solids, filename in groups:
+        _write_stl(make_compound(solids), filename)
 
-def split_left_right(solids, left_name: str, right_name: str):
+
+def split_left_right(solids, bboxes, left_name: str, right_name: str,
+                     linear_defl: float = 0.001):
     """Split solids into left and right by X position"""
-    x_centers = [s['center_x'] for s in solids]
-    x_mid = (min(x_centers) + max(x_centers)) / 2
+    x_centers = 0.5 * (bboxes[:, 0] + bboxes[:, 3])
+    x_mid = 0.5 * (x_centers.min() + x_centers.max())
 
-    left = [s for s in solids if s['center_x'] < x_mid]
-    right = [s for s in solids if s['center_x'] >= x_mid]
+    left_mask = x_centers < x_mid
+    left = [solids[i] for i in np.flatnonzero(left_mask).tolist()]
+    right = [solids[i] for i in np.flatnonzero(~left_mask).tolist()]
 
-    print(f"\nSplit by X midpoint ({x_mid:.2f}):")
-    print(f"  Left: {len(left)} solids")
-    print(f"  Right: {len(right)} solids")
+    logger.info(f"Split by X midpoint ({x_mid:.2f}):")
+    logger.info(f"  Left: {len(left)} solids")
+    logger.info(f"  Right: {len(right)} solids")
 
-    if left:
-        mesh_and_export(make_compound(left), left_name)
-    if right:
-        mesh_and_export(make_compound(right), right_name)
+    export_groups([(left, left_name), (right, right_name)], linear_defl)
 
 
 def convert_jingtuiwaike(input_dir: str, output_dir: str):
     """Convert 镜腿外壳.step -> left/right STL"""
     shape = read_step(os.path.join(input_dir, "镜腿外壳.step"))
-    solids = get_solids(shape)
-    print(f"Total solids: {len(solids)}")
+    solids, bboxes = get_solids(shape)
+    logger.info(f"Total solids: {len(solids)}")
     split_left_right(
         solids,
+        bboxes,
         os.path.join(output_dir, "镜腿外壳_左.stl"),
-        os.path.join(output_dir, "镜腿外壳_右.stl")
+        os.path.join(output_dir, "镜腿外壳_右.stl"),
+        linear_deflection(shape, bboxes)
     )
 
 
 def convert_jingtui_neike(input_dir: str, output_dir: str):
     """Convert 镜腿内壳.step -> left/right STL"""
     shape = read_step(os.path.join(input_dir, "镜腿内壳.step"))
-    solids = get_solids(shape)
-    print(f"Total solids: {len(solids)}")
+    solids, bboxes = get_solids(shape)
+    logger.info(f"Total solids: {len(solids)}")
     split_left_right(
         solids,
+        bboxes,
         os.path.join(output_dir, "镜腿内壳_左.stl"),
-        os.path.join(output_dir, "镜腿内壳_右.stl")
+        os.path.join(output_dir, "镜腿内壳_右.stl"),
+        linear_deflection(shape, bboxes)
     )
 
 
+def _process_extract(input_dir: str, step_name: str, stl_path: str):
+    """Convert one 眼镜-提取 STEP file to a single STL (merge all solids)"""
+    logger.info(f"--- Processing {step_name} -> {os.path.basename(stl_path)} ---")
+    shape = read_step(os.path.join(input_dir, step_name))
+    solids, bboxes = get_solids(shape)
+    logger.info(f"Total solids: {len(solids)} ({step_name})")
+    mesh_shape_once(shape, linear_deflection(shape, bboxes))
+
+    if len(solids) > 1:
+        mesh_and_export(make_compound(solids), stl_path)
+    elif len(solids) == 1:
+        mesh_and_export(solids[0], stl_path)
+    else:
+        # Use entire shape if no solids found
+        mesh_and_export(shape, stl_path)
+
+
 def convert_yanjingkuang(input_dir: str, output_dir: str):
     """
     Convert 眼镜框 related STEP files to STL:
     - 眼镜-提取1.step -> 眼镜框_内壳.stl (merge all solids)
     - 眼镜-提取2.step -> 眼镜框_其余.stl (merge all solids)
     """
-    # Process 眼镜-提取1.step -> 眼镜框_内壳.stl
-    print("\n--- Processing 眼镜-提取1.step -> 眼镜框_内壳.stl ---")
-    shape1 = read_step(os.path.join(input_dir, "眼镜-提取1.step"))
-    solids1 = get_solids(shape1)
-    print(f"Total solids: {len(solids1)}")
-
-    if len(solids1) > 1:
-        compound1 = make_compound(solids1)
-        mesh_and_export(compound1, os.path.join(output_dir, "眼镜框_内壳.stl"))
-    elif len(solids1) == 1:
-        mesh_and_export(solids1[0]['solid'], os.path.join(output_dir, "眼镜框_内壳.stl"))
-    else:
-        # Use entire shape if no solids found
-        mesh_and_export(shape1, os.path.join(output_dir, "眼镜框_内壳.stl"))
-
-    # Process 眼镜-提取2.step -> 眼镜框_其余.stl
-    print("\n--- Processing 眼镜-提取2.step -> 眼镜框_其余.stl ---")
-    shape2 = read_step(os.path.join(input_dir, "眼镜-提取2.step"))
-    solids2 = get_solids(shape2)
-    print(f"Total solids: {len(solids2)}")
-
-    if len(solids2) > 1:
-        compound2 = make_compound(solids2)
-        mesh_and_export(compound2, os.path.join(output_dir, "眼镜框_其余.stl"))
-    elif len(solids2) == 1:
-        mesh_and_export(solids2[0]['solid'], os.path.join(output_dir, "眼镜框_其余.stl"))
+    _process_extract(input_dir, "眼镜-提取1.step", os.path.join(output_dir, "眼镜框_内壳.stl"))
+    _process_extract(input_dir, "眼镜-提取2.step", os.path.join(output_dir, "眼镜框_其余.stl"))
+
+
+class _JobFilter(logging.Filter):
+    """Tag log records with the conversion job running in this process"""
+
+    def filter(self, record):
+        if not hasattr(record, 'job'):
+            record.job = _current_job
+        return True
+
+
+def setup_logging(log_file: Path, verbose: bool = False):
+    """
+    Log to stdout and a rotating file from a single listener thread.
+
+    Returns (queue, listener); workers send their records through the queue
+    so all output is written (and flushed) by the parent process only.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    file_handler = RotatingFileHandler(log_file, maxBytes=1024 * 1024, backupCount=3,
+                                       encoding='utf-8')
+    for handler in (stream_handler, file_handler):
+        handler.setFormatter(formatter)
+        handler.addFilter(_JobFilter())
+
+    queue = multiprocessing.Queue()
+    listener = QueueListener(queue, stream_handler, file_handler, respect_handler_level=True)
+    _route_logging(queue, logging.DEBUG if verbose else logging.INFO)
+    listener.start()
+    return queue, listener
+
+
+def _route_logging(queue, level: int):
+    """Send this process' log records to the listener queue"""
+    handler = QueueHandler(queue)
+    handler.addFilter(_JobFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+
+def init_worker(settings: dict, log_queue, log_level: int, nb_threads: int):
+    """Apply the parent's settings, logging and OCCT threading in a worker"""
+    SETTINGS.update(settings)
+    _route_logging(log_queue, log_level)
+    # Older OCP builds do not expose the switch; TBB is used there instead
+    if hasattr(OSD_Parallel, 'SetUseOcctThreads_s'):
+        OSD_Parallel.SetUseOcctThreads_s(True)
+        # One pool per process: BRepMesh meshes faces in parallel on it
+        OSD_ThreadPool.DefaultPool_s(nb_threads)
+
+
+def run_job(name: str, convert, input_dir: str, output_dir: str):
+    """Run one convert_* function in a worker process, tagging its log records"""
+    global _current_job
+    _current_job = name
+    try:
+        logger.info("=" * 60)
+        logger.info(f"Converting {name}")
+        logger.info("=" * 60)
+        convert(input_dir, output_dir)
+        logger.info(f"Done: {name}")
+    finally:
+        _current_job = 'main'
+
+
+# Independent conversion jobs: (job name, converter, STEP inputs, STL outputs)
+JOBS = [
+    ("镜腿外壳.step", convert_jingtuiwaike,
+     ["镜腿外壳.step"], ["镜腿外壳_左.stl", "镜腿外壳_右.stl"]),
+    ("镜腿内壳.step", convert_jingtui_neike,
+     ["镜腿内壳.step"], ["镜腿内壳_左.stl", "镜腿内壳_右.stl"]),
+    ("眼镜-提取1.step + 眼镜-提取2.step", convert_yanjingkuang,
+     ["眼镜-提取1.step", "眼镜-提取2.step"], ["眼镜框_内壳.stl", "眼镜框_其余.stl"]),
+]
+
+
+def output_settings():
+    """The settings that change the generated STL files"""
+    if SETTINGS['no_repair']:
+        repair = 'none'
+    elif SETTINGS['legacy_admesh']:
+        repair = 'admesh'
     else:
-        # Use entire shape if no solids found
-        mesh_and_export(shape2, os.path.join(output_dir, "眼镜框_其余.stl"))
+        repair = 'in-process'
+    return {'quality': SETTINGS['quality'], 'repair': repair}
+
+
+def input_mtimes(input_dir: Path, inputs):
+    """{STEP name: mtime_ns}, or None if an input is missing"""
+    try:
+        return {name: (input_dir / name).stat().st_mtime_ns for name in inputs}
+    except FileNotFoundError:
+        return None
+
+
+def load_stamp(output_dir: Path):
+    """Read the stamp of previous conversions, {} if there is none"""
+    try:
+        return json.loads((output_dir / STAMP_FILE).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_stamp(output_dir: Path, stamp: dict):
+    (output_dir / STAMP_FILE).write_text(json.dumps(stamp, ensure_ascii=False, indent=2),
+                                         encoding='utf-8')
+
+
+def is_up_to_date(input_dir: Path, output_dir: Path, stamp: dict, name: str, inputs, outputs):
+    """
+    True if this run would regenerate exactly the existing outputs.
+
+    The stamp records, per job, the input mtimes and output settings of the
+    last successful conversion. File mtimes alone are not enough: a git
+    checkout writes the committed STLs after the STEP files, and changing
+    --quality or the repair mode must also trigger a rebuild.
+    """
+    entry = stamp.get(name)
+    if entry is None or entry.get('settings') != output_settings():
+        return False
+    mtimes = input_mtimes(input_dir, inputs)
+    if mtimes is None or entry.get('inputs') != mtimes:
+        return False
+    return all((output_dir / filename).exists() for filename in outputs)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Convert STEP files to repaired STL files")
+    repair = parser.add_mutually_exclusive_group()
+    repair.add_argument('--no-repair', action='store_true',
+                        help="write the OCCT mesh as is (faster, but may not be manifold)")
+    repair.add_argument('--legacy-admesh', action='store_true',
+                        help="repair meshes with the admesh command-line tool instead of in-process")
+    parser.add_argument('--quality', choices=list(QUALITY_FACTORS), default='default',
+                        help="mesh fineness relative to part size (default: %(default)s)")
+    parser.add_argument('--reuse-reader', action='store_true',
+                        help="read all STEP files of a worker with one shared reader "
+                             "(faster, but a failed parse may affect later files)")
+    parser.add_argument('--parallel', type=int, metavar='N',
+                        help="number of worker processes (default: half the CPU cores)")
+    parser.add_argument('--files', nargs='+', metavar='STEP',
+                        help="only convert jobs reading these STEP files (default: all)")
+    parser.add_argument('--force', action='store_true',
+                        help="convert even if the STEP files and options are unchanged since the last run")
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help="also log debug details such as admesh statistics")
+    args = parser.parse_args()
+
+    if args.parallel is not None and args.parallel < 1:
+        parser.error("--parallel must be at least 1")
+    if args.files is not None:
+        known = {name for _, _, inputs, _ in JOBS for name in inputs}
+        unknown = sorted(set(args.files) - known)
+        if unknown:
+            parser.error(f"unknown STEP files: {', '.join(unknown)} "
+                         f"(choose from: {', '.join(sorted(known))})")
+    return args
 
 
 def main():
+    args = parse_args()
+    SETTINGS['legacy_admesh'] = args.legacy_admesh
+    SETTINGS['quality'] = args.quality
+    SETTINGS['reuse_reader'] = args.reuse_reader
+    SETTINGS['no_repair'] = args.no_repair
+
     # Get paths relative to script location
     script_dir = Path(__file__).parent.parent
     input_dir = script_dir / "assets" / "step"
@@ -244,30 +746,77 @@ def main():
     # Ensure output directory exists
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    print("=" * 60)
-    print("STEP to STL Converter (with admesh Repair)")
-    print("Fixes non-manifold edges for 3D printing!")
-    print("=" * 60)
-
-    # Convert all files
-    print("\n" + "=" * 60)
-    print("Converting 镜腿外壳.step")
-    print("=" * 60)
-    convert_jingtuiwaike(str(input_dir), str(output_dir))
-
-    print("\n" + "=" * 60)
-    print("Converting 镜腿内壳.step")
-    print("=" * 60)
-    convert_jingtui_neike(str(input_dir), str(output_dir))
-
-    print("\n" + "=" * 60)
-    print("Converting 眼镜框 (from 眼镜-提取1.step and 眼镜-提取2.step)")
-    print("=" * 60)
-    convert_yanjingkuang(str(input_dir), str(output_dir))
-
-    print("\n" + "=" * 60)
-    print("All conversions complete!")
-    print("=" * 60)
+    log_queue, listener = setup_logging(script_dir / "convert_step_to_stl.log", args.verbose)
+    try:
+        run_all(input_dir, output_dir, log_queue, args.force, args.parallel, args.files)
+    finally:
+        listener.stop()
+
+
+def run_all(input_dir: Path, output_dir: Path, log_queue, force: bool = False,
+            parallel: int = None, files=None):
+    """Convert every selected, out-of-date job in JOBS, one worker process per STEP file"""
+    logger.info("=" * 60)
+    if SETTINGS['no_repair']:
+        logger.info("STEP to STL Converter (no Repair)")
+        logger.info("Non-manifold edges are kept, not for 3D printing!")
+    else:
+        if SETTINGS['legacy_admesh']:
+            logger.info("STEP to STL Converter (with admesh Repair)")
+            logger.info("Fixes non-manifold edges for 3D printing!")
+        else:
+            logger.info("STEP to STL Converter (with in-process Repair)")
+            logger.info("Merges seam vertices, drops degenerate facets, orients closed meshes outward")
+    logger.info("=" * 60)
+
+    stamp = load_stamp(output_dir)
+    jobs = []
+    for name, convert, inputs, outputs in JOBS:
+        if files is not None and not set(inputs) & set(files):
+            continue
+        if not force and is_up_to_date(input_dir, output_dir, stamp, name, inputs, outputs):
+            logger.info(f"Up to date, skipping: {name}")
+        else:
+            # Taken before converting, so edits made during the run still
+            # count as changes next time
+            jobs.append((name, convert, input_mtimes(input_dir, inputs)))
+    if not jobs:
+        logger.info("Nothing to convert (use --force to rebuild)")
+        return
+
+    # The jobs share no state and are dominated by meshing, so run each
+    # STEP file in its own process; only path strings cross the boundary.
+    # BRepMesh already meshes faces in parallel inside every worker, so
+    # only use half the cores for processes to avoid oversubscription.
+    if parallel is None:
+        parallel = max(1, (os.cpu_count() or 1) // 2)
+    max_workers = min(len(jobs), parallel)
+    nb_threads = max(1, (os.cpu_count() or 1) // max_workers)
+    log_level = logging.getLogger().level
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker,
+                             initargs=(dict(SETTINGS), log_queue, log_level, nb_threads)) as pool:
+        futures = [
+            pool.submit(run_job, name, convert, str(input_dir), str(output_dir))
+            for name, convert, _ in jobs
+        ]
+        wait(futures)
+
+    # Log every failed job, then re-raise the first one (in job order)
+    failures = []
+    for (name, _, mtimes), future in zip(jobs, futures):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"Conversion failed: {name}", exc_info=error)
+            failures.append(error)
+        elif mtimes is not None:
+            stamp[name] = {'settings': output_settings(), 'inputs': mtimes}
+    save_stamp(output_dir, stamp)
+    if failures:
+        raise failures[0]
+
+    logger.info("=" * 60)
+    logger.info("All conversions complete!")
+    logger.info("=" * 60)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,159 @@
+"""
+In-process STL mesh repair for convert_step_to_stl.py
+
+Works on (n, 3, 3) float32 triangle arrays and needs only NumPy, so it can
+be used (and tested) without OpenCASCADE. Numba is used when installed.
+"""
+import logging
+
+import numpy as np
+
+try:  # optional JIT for the mesh repair kernels
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+logger = logging.getLogger("step2stl")
+
+# Quantized coordinates must fit the 21 bits per axis of the JIT merge key,
+# i.e. round to a value in [-MERGE_KEY_LIMIT, MERGE_KEY_LIMIT)
+MERGE_KEY_LIMIT = 2 ** 20
+
+
+def repair_triangles(triangles, tolerance: float = 0.001):
+    """
+    Repair an (n, 3, 3) triangle array in memory, returns the repaired array.
+
+    - Merges vertices closer than tolerance (like admesh -n -t)
+    - Removes facets that became degenerate after merging
+    - Orients the mesh outward (like admesh -d): all facets are reversed
+      when the mesh is closed and its total signed volume is negative.
+      Shells are never flipped on their own, since a cavity's inner shell is
+      correctly negative, and open meshes are left alone because their
+      signed volume depends on where they sit relative to the origin.
+
+    Normal values are recomputed from the winding by write_binary_stl.
+    """
+    logger.info("  Repairing mesh in-process...")
+    points = triangles.reshape(-1, 3)
+
+    # Merge by distance: all points in the same quantized grid cell become
+    # one vertex, so seams between faces share vertices. Points stay float32;
+    # the tolerance is far above float32 resolution at part scale (mm).
+    first, inverse = merge_vertices(points, tolerance)
+    vertices = points[first]
+    tris = inverse.reshape(-1, 3)
+
+    # Drop facets with two corners merged into the same vertex
+    a, b, c = tris[:, 0], tris[:, 1], tris[:, 2]
+    keep = (a != b) & (b != c) & (a != c)
+    tris = tris[keep]
+
+    # Reverse everything if the closed mesh as a whole is inside out
+    flipped = False
+    if _is_closed(tris, len(vertices)):
+        v0, v1, v2 = vertices[tris[:, 0]], vertices[tris[:, 1]], vertices[tris[:, 2]]
+        volume = np.einsum('ij,ij->i', v0, np.cross(v1, v2)).sum(dtype=np.float64) / 6
+        flipped = volume < 0
+    if flipped:
+        tris = tris[:, ::-1]
+
+    logger.info(f"    {len(points) - len(vertices)} vertices merged, "
+                f"{np.count_nonzero(~keep)} degenerate facets removed"
+                f"{', normal directions reversed' if flipped else ''}")
+    return vertices[tris]
+
+
+def merge_vertices(points, tolerance: float):
+    """
+    Group points by quantized grid cell, returns (first, inverse) like np.unique.
+
+    Both paths quantize in float64, so the grouping does not depend on
+    whether Numba is installed.
+    """
+    # Below LIMIT - 1 the rounded value is at most LIMIT - 1 in magnitude, so
+    # +LIMIT and -LIMIT (which share a 21-bit field) can never both occur
+    if njit is not None and float(np.abs(points).max()) / tolerance < MERGE_KEY_LIMIT - 1:
+        first, inverse = _merge_vertices_jit(points, tolerance)
+    else:
+        keys = np.round(points.astype(np.float64) / tolerance).astype(np.int64)
+        _, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    return first, inverse.reshape(-1)
+
+
+def _is_closed(tris, n_vertices: int):
+    """True if every edge is shared by exactly two facets"""
+    edges = np.sort(tris[:, [0, 1, 1, 2, 2, 0]].reshape(-1, 2), axis=1)
+    _, counts = np.unique(edges[:, 0] * n_vertices + edges[:, 1], return_counts=True)
+    return len(counts) > 0 and bool(np.all(counts == 2))
+
+
+def _merge_vertices_kernel(points, tolerance):
+    """
+    Hash-based vertex merge, returns (first, inverse) like np.unique.
+
+    Each quantized (ix, iy, iz) is packed into a uint64 key (21 bits per
+    axis) and looked up in an open-addressing table with linear probing.
+    """
+    n = points.shape[0]
+    capacity = 1
+    while capacity < 2 * n:
+        capacity *= 2
+    slot_mask = capacity - 1
+    table_keys = np.zeros(capacity, dtype=np.uint64)
+    table_ids = np.full(capacity, -1, dtype=np.int64)
+    first = np.empty(n, dtype=np.int64)
+    inverse = np.empty(n, dtype=np.int64)
+    count = 0
+    for i in range(n):
+        # Same float64 quantization as the NumPy path in merge_vertices
+        ix = np.int64(np.round(np.float64(points[i, 0]) / tolerance)) & 0x1FFFFF
+        iy = np.int64(np.round(np.float64(points[i, 1]) / tolerance)) & 0x1FFFFF
+        iz = np.int64(np.round(np.float64(points[i, 2]) / tolerance)) & 0x1FFFFF
+        key = np.uint64(ix | (iy << 21) | (iz << 42))
+        slot = np.int64((key * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)) & slot_mask
+        while table_ids[slot] != -1 and table_keys[slot] != key:
+            slot = (slot + 1) & slot_mask
+        if table_ids[slot] == -1:
+            table_keys[slot] = key
+            table_ids[slot] = count
+            first[count] = i
+            count += 1
+        inverse[i] = table_ids[slot]
+    return first[:count], inverse
+
+
+def _unit_normals_kernel(triangles):
+    """Unit normals of an (n, 3, 3) triangle array, zero for degenerate facets"""
+    n = triangles.shape[0]
+    normals = np.zeros((n, 3), dtype=triangles.dtype)
+    for i in prange(n):
+        ux = triangles[i, 1, 0] - triangles[i, 0, 0]
+        uy = triangles[i, 1, 1] - triangles[i, 0, 1]
+        uz = triangles[i, 1, 2] - triangles[i, 0, 2]
+        vx = triangles[i, 2, 0] - triangles[i, 0, 0]
+        vy = triangles[i, 2, 1] - triangles[i, 0, 1]
+        vz = triangles[i, 2, 2] - triangles[i, 0, 2]
+        nx = uy * vz - uz * vy
+        ny = uz * vx - ux * vz
+        nz = ux * vy - uy * vx
+        length = np.sqrt(nx * nx + ny * ny + nz * nz)
+        if length > 0:
+            normals[i, 0] = nx / length
+            normals[i, 1] = ny / length
+            normals[i, 2] = nz / length
+    return normals
+
+
+if njit is not None:
+    _merge_vertices_jit = njit(cache=True)(_merge_vertices_kernel)
+    _unit_normals_jit = njit(parallel=True, cache=True)(_unit_normals_kernel)
+
+
+def unit_normals(triangles):
+    """Unit normals of an (n, 3, 3) triangle array, zero for degenerate facets"""
+    if njit is not None:
+        return _unit_normals_jit(np.ascontiguousarray(triangles))
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    lengths = np.linalg.norm(normals, axis=1, keepdims=True)
+    return np.divide(normals, lengths, out=np.zeros_like(normals), where=lengths > 0)
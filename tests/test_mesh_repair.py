@@ -0,0 +1,111 @@
+"""Tests for the in-process STL repair (no OpenCASCADE needed)"""
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import mesh_repair  # noqa: E402
+from mesh_repair import repair_triangles  # noqa: E402
+
+
+def cube(lo, hi, outward=True):
+    """Axis-aligned box as 12 triangles, normals pointing outward (or inward)"""
+    corners = np.array([[x, y, z] for x in (lo, hi) for y in (lo, hi) for z in (lo, hi)],
+                       dtype=np.float32)
+    quads = [
+        (0, 1, 3, 2),  # x = lo
+        (4, 6, 7, 5),  # x = hi
+        (0, 4, 5, 1),  # y = lo
+        (2, 3, 7, 6),  # y = hi
+        (0, 2, 6, 4),  # z = lo
+        (1, 5, 7, 3),  # z = hi
+    ]
+    tris = []
+    for a, b, c, d in quads:
+        tris += [(a, b, c), (a, c, d)]
+    tris = np.array(tris)
+    if not outward:
+        tris = tris[:, ::-1]
+    return corners[tris]
+
+
+def volume(triangles):
+    t = triangles.astype(np.float64)
+    return np.einsum('ij,ij->i', t[:, 0], np.cross(t[:, 1], t[:, 2])).sum() / 6
+
+
+def normals(triangles):
+    return np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+
+
+def test_cube_is_outward():
+    assert volume(cube(0, 10)) == 1000
+
+
+def test_hollow_cube_keeps_cavity():
+    mesh = np.concatenate([cube(0, 10), cube(3, 7, outward=False)])
+    assert volume(mesh) == 936
+
+    repaired = repair_triangles(mesh)
+    assert len(repaired) == len(mesh)
+    assert np.isclose(volume(repaired), 936)
+
+
+def test_inside_out_mesh_is_reversed():
+    mesh = np.concatenate([cube(0, 10, outward=False), cube(3, 7)])
+    assert np.isclose(volume(repair_triangles(mesh)), 936)
+
+
+def test_open_sheet_keeps_orientation():
+    # +Z facing sheet below the origin: its signed volume is negative
+    sheet = np.array([
+        [[0, 0, -5], [1, 0, -5], [1, 1, -5]],
+        [[0, 0, -5], [1, 1, -5], [0, 1, -5]],
+    ], dtype=np.float32)
+    repaired = repair_triangles(sheet)
+    assert np.all(normals(repaired)[:, 2] > 0)
+
+
+def test_merges_vertices_and_drops_degenerate_facets():
+    mesh = cube(0, 10)
+    mesh[0, 0] += 1e-4  # within tolerance of the cube corner
+    sliver = np.array([[[0, 0, 0], [0.0002, 0, 0], [10, 10, 10]]], dtype=np.float32)
+
+    repaired = repair_triangles(np.concatenate([mesh, sliver]))
+    assert len(repaired) == 12
+    assert len(np.unique(repaired.reshape(-1, 3), axis=0)) == 8
+
+
+def test_merge_matches_without_numba(monkeypatch):
+    rng = np.random.default_rng(0)
+    points = (rng.random((200000, 3)) * 100 - 50).astype(np.float32)
+    points = np.concatenate([points, points + np.float32(4e-4)])
+
+    first, inverse = mesh_repair.merge_vertices(points, 0.001)
+    monkeypatch.setattr(mesh_repair, 'njit', None)
+    first_np, inverse_np = mesh_repair.merge_vertices(points, 0.001)
+
+    # Same grouping, up to the order in which groups are numbered
+    assert len(first) == len(first_np)
+    pairs = np.unique(np.stack([inverse, inverse_np], axis=1), axis=0)
+    assert len(pairs) == len(first)
+
+    # Just inside the old guard: these round to +2**20 and -2**20, which
+    # would share one 21-bit key field
+    edge = np.array([[1048.5756, 0, 0], [-1048.5756, 0, 0]], dtype=np.float32)
+    monkeypatch.undo()
+    assert len(mesh_repair.merge_vertices(edge, 0.001)[0]) == 2
+    monkeypatch.setattr(mesh_repair, 'njit', None)
+    assert len(mesh_repair.merge_vertices(edge, 0.001)[0]) == 2
+
+
+def test_unit_normals_match_without_numba(monkeypatch):
+    sliver = np.array([[[0, 0, 0], [1, 0, 0], [2, 0, 0]]], dtype=np.float32)
+    triangles = np.concatenate([cube(0, 10)] * 2000 + [sliver])
+
+    result = mesh_repair.unit_normals(triangles)
+    monkeypatch.setattr(mesh_repair, 'njit', None)
+    assert np.allclose(result, mesh_repair.unit_normals(triangles))
+    assert np.all(result[-1] == 0)